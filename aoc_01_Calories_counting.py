@@ -1,34 +1,292 @@
-# Input
-with open("aoc_01_input.txt") as f:
-    data = f.read().splitlines()
-
-# Part 1
-
-# Recreate the inventories of the elves
-# When encountering an empty string, sum the previous
-# inputs and start a new inventory
-current_calories_count = 0
-all_inventories_totals = []
-for snack in data:
-    if snack == "":
-        all_inventories_totals.append(current_calories_count)
-        current_calories_count = 0
+import heapq
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Tuple
+
+CHUNK_SIZE = 1 << 20
+
+
+def read_chunks(
+    f: BinaryIO, chunk_size: int = CHUNK_SIZE, end: Optional[int] = None
+) -> Iterator[bytes]:
+    """Read a file chunk by chunk, from its current position.
+
+    Args:
+        f (BinaryIO): File opened in binary mode.
+        chunk_size (int): Number of bytes read at once.
+        end (Optional[int]): Offset to stop reading at, defaults to the
+            end of the file.
+
+    Yields:
+        bytes: Chunks of the file, in order.
+    """
+    while True:
+        if end is not None:
+            chunk_size = min(chunk_size, end - f.tell())
+            if chunk_size <= 0:
+                return
+        chunk = f.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_inventory_totals(chunks: Iterable[bytes]) -> Iterator[int]:
+    """Sum the calories of each inventory, one inventory at a time.
+
+    Args:
+        chunks (Iterable[bytes]): Chunks of the input, lines may be split
+            across two chunks.
+
+    Yields:
+        int: Total number of calories of each inventory.
+    """
+    current_calories_count = 0
+    in_inventory = False
+    leftover = b""
+    for chunk in chunks:
+        lines = (leftover + chunk).split(b"\n")
+        # The last line may be incomplete, keep it for the next chunk.
+        leftover = lines.pop()
+        for snack in lines:
+            if snack.strip():
+                current_calories_count += int(snack)
+                in_inventory = True
+            elif in_inventory:
+                yield current_calories_count
+                current_calories_count = 0
+                in_inventory = False
+
+    # The file may not end with a blank line (or even a newline), the
+    # last inventory still has to be counted.
+    if leftover.strip():
+        current_calories_count += int(leftover)
+        in_inventory = True
+    if in_inventory:
+        yield current_calories_count
+
+
+class TopK:
+    """The k highest values seen so far.
+
+    Partial results computed on different parts of the input can be
+    merged together, the result is the same as if all the values had
+    been pushed into a single TopK.
+    """
+
+    def __init__(self, k: int = 3) -> None:
+        if k < 1:
+            raise ValueError(f"k must be at least 1, got {k}")
+        self.k = k
+        # Min-heap, the smallest kept value is always at index 0.
+        self._heap: List[int] = []
+
+    def push(self, value: int) -> None:
+        """Keep value if it is one of the k highest.
+
+        Args:
+            value (int): Value to push.
+        """
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, value)
+        elif value > self._heap[0]:
+            heapq.heapreplace(self._heap, value)
+
+    def extend(self, values: Iterable[int]) -> None:
+        """Push all values, one at a time.
+
+        Args:
+            values (Iterable[int]): Values to push.
+        """
+        for value in values:
+            self.push(value)
+
+    def merge(self, other: "TopK") -> "TopK":
+        """Merge two partial results.
+
+        Args:
+            other (TopK): Partial result to merge with this one.
+
+        Returns:
+            TopK: The k highest values of both partial results, k being
+            the largest k of the two.
+        """
+        merged = TopK(max(self.k, other.k))
+        merged._heap = heapq.nlargest(merged.k, self._heap + other._heap)
+        heapq.heapify(merged._heap)
+        return merged
+
+    @property
+    def values(self) -> List[int]:
+        """Get the kept values, highest first.
+
+        Returns:
+            List[int]: At most k values.
+        """
+        return sorted(self._heap, reverse=True)
+
+    def __add__(self, other: "TopK") -> "TopK":
+        if not isinstance(other, TopK):
+            return NotImplemented
+        return self.merge(other)
+
+    def __repr__(self) -> str:
+        return f"TopK(k={self.k}, values={self.values})"
+
+
+def top_k(values: Iterable[int], k: int = 3, backend: str = "heap") -> TopK:
+    """Select the k highest values in O(n log k).
+
+    Args:
+        values (Iterable[int]): Values to select from.
+        k (int): Number of values to keep.
+        backend (str): "heap" pushes the values one at a time and works
+            on streams, "nlargest" hands the whole batch to
+            heapq.nlargest, which is faster on values already in memory.
+
+    Returns:
+        TopK: The k highest values.
+    """
+    result = TopK(k)
+    if backend == "heap":
+        result.extend(values)
+    elif backend == "nlargest":
+        result._heap = heapq.nlargest(k, values)
+        heapq.heapify(result._heap)
     else:
-        current_calories_count += int(snack)
+        raise ValueError(f"Unknown top-k backend: {backend!r}")
+    return result
+
+
+def _next_inventory_start(f: BinaryIO, position: int, file_size: int) -> int:
+    """Find the first inventory starting at or after position.
+
+    Args:
+        f (BinaryIO): File opened in binary mode.
+        position (int): Offset to start looking from.
+        file_size (int): Size of the file.
+
+    Returns:
+        int: Offset right after the next blank line, or the size of the
+        file if there is none.
+    """
+    # A blank line is "\n\n", or "\n\r\n" in files with CRLF endings.
+    # Start two bytes earlier in case position is in the middle of one.
+    search_from = max(position - 2, 0)
+    f.seek(search_from)
+    previous = b""
+    for chunk in read_chunks(f, chunk_size=1 << 16):
+        block = previous + chunk
+        ends = []
+        for separator in (b"\n\n", b"\n\r\n"):
+            index = block.find(separator)
+            if index != -1:
+                ends.append(index + len(separator))
+        if ends:
+            return search_from - len(previous) + min(ends)
+        search_from += len(chunk)
+        previous = block[-2:]
+    return file_size
+
+
+def split_on_inventories(path: str, parts: int) -> List[Tuple[int, int]]:
+    """Split a file in byte ranges that never cut through an inventory.
+
+    Args:
+        path (str): Path of the input file.
+        parts (int): Number of ranges wanted.
+
+    Returns:
+        List[Tuple[int, int]]: (start, end) offsets of at most parts
+        non-empty ranges, covering the whole file.
+    """
+    file_size = os.path.getsize(path)
+    boundaries = [0]
+    with open(path, "rb") as f:
+        for part in range(1, parts):
+            position = max(file_size * part // parts, boundaries[-1])
+            boundaries.append(_next_inventory_start(f, position, file_size))
+    boundaries.append(file_size)
+    return [
+        (start, end)
+        for start, end in zip(boundaries, boundaries[1:])
+        if start < end
+    ]
+
+
+def _rank_range(path: str, start: int, end: int, k: int) -> TopK:
+    with open(path, "rb") as f:
+        f.seek(start)
+        return top_k(iter_inventory_totals(read_chunks(f, end=end)), k=k)
+
+
+def parallel_top_k(
+    path: str, k: int = 3, workers: Optional[int] = None
+) -> TopK:
+    """Rank the inventories of a file using several processes.
+
+    Args:
+        path (str): Path of the input file.
+        k (int): Number of totals to keep.
+        workers (Optional[int]): Number of processes, defaults to the
+            number of CPUs.
+
+    Returns:
+        TopK: The k highest totals of the whole file.
+    """
+    workers = workers or os.cpu_count() or 1
+    ranges = split_on_inventories(path, workers)
+    result = TopK(k)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_rank_range, path, start, end, k)
+            for start, end in ranges
+        ]
+        for future in futures:
+            result = result.merge(future.result())
+    return result
+
+
+def benchmark(path: str, worker_counts: Iterable[int] = (1, 2, 4, 8)) -> None:
+    """Print how long ranking a file takes for each number of workers.
 
-print("Highest number of calories :", max(all_inventories_totals))
+    Args:
+        path (str): Path of the input file.
+        worker_counts (Iterable[int]): Numbers of workers to try.
+    """
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        expected = top_k(iter_inventory_totals(read_chunks(f))).values
+    serial_time = time.perf_counter() - start
+    print(f"serial    : {serial_time:.3f}s")
 
+    for workers in worker_counts:
+        start = time.perf_counter()
+        result = parallel_top_k(path, workers=workers).values
+        elapsed = time.perf_counter() - start
+        assert result == expected, (result, expected)
+        print(
+            f"{workers:>2} workers: {elapsed:.3f}s "
+            f"(x{serial_time / elapsed:.2f})"
+        )
 
-# Part 2
 
-# Get the 3 highest numbers of calories in all_inventories_totals
-# and sum them
+if __name__ == "__main__":
+    if "--benchmark" in sys.argv:
+        benchmark("aoc_01_input.txt")
+        sys.exit()
 
-# Sort the list
-all_inventories_totals.sort()
+    # Input
+    # The file is streamed, inventories are summed as they are read
+    # and only the 3 highest totals are kept.
+    with open("aoc_01_input.txt", "rb") as f:
+        highest_calories = top_k(iter_inventory_totals(read_chunks(f))).values
 
-# Get the 3 highest numbers
-highest_calories = all_inventories_totals[-3:]
+    # Part 1
+    print("Highest number of calories :", highest_calories[0])
 
-# Sum them
-print("Highest number of calories (sum top 3):", sum(highest_calories))
+    # Part 2
+    # Sum the 3 highest numbers of calories
+    print("Highest number of calories (sum top 3):", sum(highest_calories))
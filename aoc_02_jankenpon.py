@@ -0,0 +1,260 @@
+from collections import namedtuple
+from typing import Iterable, Iterator, List, Union
+
+# Choices are numbered 0: Rock, 1: Paper, 2: Scissors. A choice beats
+# the one right before it, so (player - opponent) % 3 is 0 for a tie,
+# 1 for a win and 2 for a loss.
+OUTCOME_POINTS = (3, 6, 0)
+STRATEGIES = ("choice", "outcome")
+
+
+class JankenChoice:
+    """Rock, Paper or Scissors.
+
+    Each choice is a singleton: calling Rock() always returns the same
+    immutable instance, so battles only hold references to the three
+    existing choices.
+    """
+
+    __slots__ = ("name", "points", "beats", "loses_to")
+    _instance = None
+    _points = 0
+
+    def __new__(cls):
+        # Look in the class itself, an inherited _instance would belong
+        # to another choice.
+        instance = cls.__dict__.get("_instance")
+        if instance is None:
+            instance = super().__new__(cls)
+            object.__setattr__(instance, "name", cls.__name__)
+            object.__setattr__(instance, "points", cls._points)
+            cls._instance = instance
+        return instance
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __reduce__(self):
+        # Copies and unpickled choices go through __new__, so they are
+        # the singleton itself.
+        return (type(self), ())
+
+    def __str__(self):
+        return self.name
+
+    def __repr__(self):
+        return self.name
+
+    def __eq__(self, other):
+        return self is other
+
+    __hash__ = object.__hash__
+
+    def __gt__(self, other):
+        if not isinstance(other, JankenChoice):
+            return False
+        return self is other.loses_to
+
+    def __lt__(self, other):
+        if not isinstance(other, JankenChoice):
+            return False
+        return self is other.beats
+
+
+class Rock(JankenChoice):
+    __slots__ = ()
+    _points = 1
+
+
+class Paper(JankenChoice):
+    __slots__ = ()
+    _points = 2
+
+
+class Scissors(JankenChoice):
+    __slots__ = ()
+    _points = 3
+
+
+# Wire the relations once, between the singletons.
+for winner, loser in (
+    (Rock(), Scissors()),
+    (Paper(), Rock()),
+    (Scissors(), Paper()),
+):
+    object.__setattr__(winner, "beats", loser)
+    object.__setattr__(loser, "loses_to", winner)
+
+
+Battle = namedtuple("Battle", ["opponent_choice", "player_choice"])
+
+LETTER_TO_CHOICE = {
+    "A": Rock(),
+    "B": Paper(),
+    "C": Scissors(),
+    "X": Rock(),
+    "Y": Paper(),
+    "Z": Scissors(),
+}
+
+
+def parse_battle(line: str, strategy: str = "choice") -> Battle:
+    """Parse a single battle.
+
+    Args:
+        line (str): Battle, such as "A Y".
+        strategy (str): "choice" if X, Y, Z are the player's choice (part
+            1), "outcome" if they are the expected outcome (part 2).
+
+    Returns:
+        Battle: Parsed battle.
+    """
+    opponent_letter, letter = line.split()
+    opponent_choice = LETTER_TO_CHOICE[opponent_letter]
+    if strategy == "choice":
+        player_choice = LETTER_TO_CHOICE[letter]
+    elif strategy == "outcome":
+        if letter == "X":
+            player_choice = opponent_choice.beats
+        elif letter == "Y":
+            player_choice = opponent_choice
+        elif letter == "Z":
+            player_choice = opponent_choice.loses_to
+        else:
+            raise ValueError(f"Unknown outcome: {letter!r}")
+    else:
+        raise ValueError(f"Unknown strategy: {strategy!r}")
+    return Battle(opponent_choice, player_choice)
+
+
+def iter_battles(path: str, strategy: str = "choice") -> Iterator[Battle]:
+    """Parse battles from an input file, one line at a time.
+
+    Args:
+        path (str): Path of the input file.
+        strategy (str): "choice" or "outcome".
+
+    Yields:
+        Battle: Parsed battles, in order.
+    """
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield parse_battle(line, strategy)
+
+
+def compute_outcome(
+    opponent_choice: Union[Rock, Paper, Scissors],
+    player_choice: Union[Rock, Paper, Scissors],
+) -> int:
+    """Compute the outcome of a battle.
+
+    Args:
+        opponent_choice (Union[Rock, Paper, Scissors]): Opponent's choice.
+        player_choice (Union[Rock, Paper, Scissors]): Player's choice.
+
+    Returns:
+        int: Outcome of the battle.
+
+    The outcome is computed as follows: The player choice's points
+    + the outcome's points : 0 for a loss, 3 for a tie, 6 for a win.
+    """
+    if player_choice is opponent_choice:
+        return player_choice.points + 3
+    elif player_choice.beats is opponent_choice:
+        return player_choice.points + 6
+    else:
+        return player_choice.points
+
+
+def score_stream(battles: Iterable[Battle]) -> int:
+    """Sum the outcomes of battles in a single pass.
+
+    Args:
+        battles (Iterable[Battle]): Battles, such as iter_battles() output.
+
+    Returns:
+        int: Player's total score.
+    """
+    total_score = 0
+    for battle in battles:
+        total_score += compute_outcome(
+            battle.opponent_choice, battle.player_choice
+        )
+    return total_score
+
+
+def _build_score_table(strategy: str) -> List[List[int]]:
+    """Build the score of every possible round.
+
+    Args:
+        strategy (str): "choice" if X, Y, Z are the player's choice (part
+            1), "outcome" if they are the expected outcome (part 2).
+
+    Returns:
+        List[List[int]]: table[opponent][column] is the player's score,
+        opponent being 0, 1, 2 for A, B, C and column 0, 1, 2 for X, Y, Z.
+    """
+    table = []
+    for opponent in range(3):
+        row = []
+        for column in range(3):
+            if strategy == "choice":
+                player = column
+            elif strategy == "outcome":
+                # X: lose, Y: draw, Z: win.
+                player = (opponent + column - 1) % 3
+            else:
+                raise ValueError(f"Unknown strategy: {strategy!r}")
+            row.append(player + 1 + OUTCOME_POINTS[(player - opponent) % 3])
+        table.append(row)
+    return table
+
+
+SCORE_TABLES = {
+    strategy: _build_score_table(strategy) for strategy in STRATEGIES
+}
+
+
+def score_line(line: bytes, strategy: str = "choice") -> int:
+    """Score a single round.
+
+    Args:
+        line (bytes): Round, such as b"A Y".
+        strategy (str): "choice" or "outcome".
+
+    Returns:
+        int: Player's score for this round.
+    """
+    return SCORE_TABLES[strategy][line[0] - ord("A")][line[2] - ord("X")]
+
+
+def score_buffer(data: bytes, strategy: str = "choice") -> int:
+    """Score every round of a buffer at once.
+
+    There are only 9 different rounds, so instead of looking at each line
+    we count how many times each round appears, every count being a
+    single pass done in C by bytes.count.
+
+    Args:
+        data (bytes): Content of an input file.
+        strategy (str): "choice" or "outcome".
+
+    Returns:
+        int: Player's total score.
+    """
+    table = SCORE_TABLES[strategy]
+    total_score = 0
+    for opponent, opponent_letter in enumerate(b"ABC"):
+        for column, column_letter in enumerate(b"XYZ"):
+            battle = bytes((opponent_letter, ord(" "), column_letter))
+            total_score += table[opponent][column] * data.count(battle)
+    return total_score
+
+
+if __name__ == "__main__":
+    with open("aoc_02_input.txt", "rb") as f:
+        data = f.read()
+
+    print("Part 1:", score_buffer(data, strategy="choice"))
+    print("Part 2:", score_buffer(data, strategy="outcome"))
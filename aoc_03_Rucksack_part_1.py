@@ -1,9 +1,13 @@
 from collections import namedtuple
-from typing import Tuple
+from functools import reduce
+from itertools import zip_longest
+from operator import and_, or_
+from typing import Iterable, Iterator, Optional, Tuple
+import mmap
+import os
 import string
-
-with open("aoc_03_input.txt") as f:
-    data = f.read().splitlines()
+import sys
+import time
 
 
 class Rugsack:
@@ -89,34 +93,245 @@ class ElvenGroup:
         return badge.pop()
 
 
-def get_group_of_elves(rugsack_list: list, size=3) -> tuple:
-    """Get group of size rugsacks.
+def get_group_of_elves(
+    rugsacks: Iterable, size: int = 3, strict: bool = True
+) -> Iterator[tuple]:
+    """Get groups of size rugsacks.
 
     Args:
-        rugsack_list (list): List of rugsacks.
+        rugsacks (Iterable): Rugsacks, any iterable, consumed lazily.
+        size (int): Number of rugsacks in a group.
+        strict (bool): If True, raise when the last group is incomplete,
+            otherwise yield it as a shorter tuple.
 
-    Returns:
+    Yields:
         tuple: Tuple of size rugsacks.
+
+    Raises:
+        ValueError: If strict and the number of rugsacks is not a multiple
+            of size.
+    """
+    if size < 1:
+        raise ValueError(f"size must be at least 1, got {size}")
+    # The same iterator is repeated size times, so zip_longest pulls size
+    # consecutive rugsacks for each group. Only the last group can be
+    # padded with the sentinel.
+    missing = object()
+    iterators = [iter(rugsacks)] * size
+    for group in zip_longest(*iterators, fillvalue=missing):
+        if group[-1] is missing:
+            group = group[: group.index(missing)]
+            if strict:
+                raise ValueError(
+                    f"Incomplete group of {len(group)} rugsacks at the end, "
+                    f"expected {size}"
+                )
+        yield group
+
+
+# Bitmask engine: a set of items is an int where the bit at position
+# priority is set for each item. Intersecting two sets is then a single &,
+# and the priority of the only common item is the position of its bit.
+ITEM_BITS = {
+    letter: 1 << priority for letter, priority in Rugsack.priorities.items()
+}
+
+
+def item_mask(items: str) -> int:
+    """Encode items as a bitmask.
+
+    Args:
+        items (str): Items, such as "vJrwpWtwJgWr".
+
+    Returns:
+        int: Bitmask with the bit at position priority set for each item.
+    """
+    # The lookups and the ors both run in C, no Python loop per item.
+    return reduce(or_, map(ITEM_BITS.__getitem__, items), 0)
+
+
+def mask_priority(mask: int) -> int:
+    """Get the priority of the highest item of a bitmask.
+
+    Args:
+        mask (int): Bitmask, usually with a single item.
+
+    Returns:
+        int: Priority of the item.
     """
-    # Split list of rugsacks in groups of 3
-    current_index = 0
-    for _ in rugsack_list:
-        yield tuple(rugsack_list[current_index : current_index + size]) # noqa
-        current_index += size
+    return mask.bit_length() - 1
+
+
+def duplicate_priority(items: str) -> int:
+    """Get the priority of the item present in both compartments.
+
+    Args:
+        items (str): Items of a rugsack.
+
+    Returns:
+        int: Priority of the duplicate item.
+    """
+    half = len(items) // 2
+    return mask_priority(item_mask(items[:half]) & item_mask(items[half:]))
+
+
+def badge_priority(group: Iterable[str]) -> int:
+    """Get the priority of the item present in every rugsack of a group.
+
+    Args:
+        group (Iterable[str]): Items of each rugsack of the group.
+
+    Returns:
+        int: Priority of the badge.
+    """
+    return mask_priority(reduce(and_, map(item_mask, group)))
+
+
+def sum_duplicate_priorities(path: str) -> int:
+    """Sum the priorities of the duplicate items of a whole file (part 1).
+
+    Args:
+        path (str): Path of the input file.
+
+    Returns:
+        int: Sum of the priorities.
+    """
+    with open(path) as f:
+        return sum(map(duplicate_priority, filter(None, map(str.strip, f))))
+
+
+def sum_badge_priorities(path: str, size: int = 3) -> int:
+    """Sum the priorities of the badges of a whole file (part 2).
+
+    Args:
+        path (str): Path of the input file.
+        size (int): Number of rugsacks in a group.
+
+    Returns:
+        int: Sum of the priorities.
+    """
+    with open(path) as f:
+        lines = filter(None, map(str.strip, f))
+        return sum(
+            badge_priority(group)
+            for group in get_group_of_elves(lines, size=size)
+        )
+
+
+# Priorities indexed by byte value, for inputs read as bytes.
+BYTE_PRIORITIES = tuple(
+    Rugsack.priorities.get(chr(byte), 0) for byte in range(256)
+)
+
+
+def _iter_lines(buffer: mmap.mmap) -> Iterator[bytes]:
+    """Iterate over the non-blank lines of a buffer, without line endings.
+
+    Args:
+        buffer (mmap.mmap): Memory-mapped input file.
+
+    Returns:
+        Iterator[bytes]: Lines, in order.
+    """
+    return filter(None, map(bytes.rstrip, iter(buffer.readline, b"")))
+
+
+def sum_priorities_mmap(path: str, group_size: Optional[int] = None) -> int:
+    """Sum priorities of a memory-mapped file, a line at a time.
+
+    Each line is split by readline and each intersection is built by set,
+    both in C, so the only Python work is one step per line or group.
+
+    Args:
+        path (str): Path of the input file.
+        group_size (Optional[int]): None to sum the duplicate items of
+            each rugsack (part 1), or the number of rugsacks in a group to
+            sum the badges (part 2).
+
+    Returns:
+        int: Sum of the priorities.
+
+    Raises:
+        ValueError: If the number of rugsacks is not a multiple of
+            group_size.
+    """
+    if os.path.getsize(path) == 0:
+        return 0
+    with open(path, "rb") as f, mmap.mmap(
+        f.fileno(), 0, access=mmap.ACCESS_READ
+    ) as buffer:
+        lines = _iter_lines(buffer)
+        if group_size is None:
+            common_items = (
+                set(line[: len(line) // 2]).intersection(
+                    line[len(line) // 2 :]
+                )
+                for line in lines
+            )
+        else:
+            common_items = (
+                set(group[0]).intersection(*group[1:])
+                for group in get_group_of_elves(lines, size=group_size)
+            )
+        return sum(BYTE_PRIORITIES[items.pop()] for items in common_items)
+
+
+def benchmark(path: str) -> None:
+    """Print how long each engine takes to process a file.
+
+    Args:
+        path (str): Path of the input file.
+    """
+    start = time.perf_counter()
+    with open(path) as f:
+        all_rugsacks = [Rugsack(items) for items in f.read().splitlines()]
+    sets_part_1 = sum(
+        rugsack.duplicate_item.priority for rugsack in all_rugsacks
+    )
+    sets_part_2 = sum(
+        ElvenGroup(group).priority
+        for group in get_group_of_elves(all_rugsacks)
+    )
+    sets_time = time.perf_counter() - start
+    print(f"sets    : {sets_time:.3f}s")
+
+    start = time.perf_counter()
+    masks_part_1 = sum_duplicate_priorities(path)
+    masks_part_2 = sum_badge_priorities(path)
+    masks_time = time.perf_counter() - start
+    print(f"bitmasks: {masks_time:.3f}s (x{sets_time / masks_time:.2f})")
+
+    start = time.perf_counter()
+    mmap_part_1 = sum_priorities_mmap(path)
+    mmap_part_2 = sum_priorities_mmap(path, group_size=3)
+    mmap_time = time.perf_counter() - start
+    print(f"mmap    : {mmap_time:.3f}s (x{sets_time / mmap_time:.2f})")
+
+    assert (
+        (sets_part_1, sets_part_2)
+        == (masks_part_1, masks_part_2)
+        == (mmap_part_1, mmap_part_2)
+    )
 
 
 if __name__ == "__main__":
+    if "--benchmark" in sys.argv:
+        benchmark("aoc_03_input.txt")
+        sys.exit()
+
     # Part 1
-    # all_rugsacks = [Rugsack(items) for items in data]
-    # duplicate_items = [rugsack.duplicate_item for rugsack in all_rugsacks]
-    # print(sum(item.priority for item in duplicate_items))
+    # with open("aoc_03_input.txt") as f:
+    #     all_rugsacks = (Rugsack(line.strip()) for line in f if line.strip())
+    #     duplicates = [rugsack.duplicate_item for rugsack in all_rugsacks]
+    #     print(sum(item.priority for item in duplicates))
 
     # Part 2
-    all_rugsacks = [Rugsack(items) for items in data]
-    group_generator = get_group_of_elves(all_rugsacks)
-    sum_of_priorities = 0
-    for group in group_generator:
-        if group:
+    # Rugsacks are parsed lazily, only one group is in memory at a time.
+    with open("aoc_03_input.txt") as f:
+        all_rugsacks = (Rugsack(line.strip()) for line in f if line.strip())
+        group_generator = get_group_of_elves(all_rugsacks)
+        sum_of_priorities = 0
+        for group in group_generator:
             elven_group = ElvenGroup(group)
             sum_of_priorities += elven_group.priority
 
@@ -1,20 +1,35 @@
+import os
 import re
-from enum import Enum, auto
-from typing import List, NamedTuple
+import struct
+from array import array
+from enum import Enum
+from itertools import islice, zip_longest
+from typing import (
+    BinaryIO,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+)
 
+INSTRUCTION_PATTERN = re.compile(r"move (\d+) from (\d+) to (\d+)")
 
-with open("aoc_05_input.txt") as f:
-    data = f.read().splitlines()
+# Checkpoint layout: header, then for each stack its number of crates
+# followed by its crate letters from bottom to top, one byte each.
+CHECKPOINT_MAGIC = b"CRT1"
+CHECKPOINT_HEADER = struct.Struct("<4sHQI")  # magic, model, cursor, stacks
+CHECKPOINT_STACK_SIZE = struct.Struct("<I")
+CHECKPOINT_SUFFIX = ".ckpt"
 
 
-class State(Enum):
-    IN_BRACKETS = auto()
-    OUTSIDE_BRACKETS = auto()
-
-
-class SupplyCrate(NamedTuple):
-    letter: str
-    column: int
+class MoverModel(Enum):
+    # Crates are moved one by one, the moved crates end up reversed.
+    CRATE_MOVER_9000 = 9000
+    # Crates are moved in a single operation, their order is kept.
+    CRATE_MOVER_9001 = 9001
 
 
 class Instruction(NamedTuple):
@@ -24,90 +39,448 @@ class Instruction(NamedTuple):
 
 
 class SupplyStackParser:
-    state = State.OUTSIDE_BRACKETS
-
-    def parse_supply_stacks(self, line: str) -> List[SupplyCrate]:
-        supply_crates = []
-        # Columns numbers start at 1, we start at 0 to ease list
-        # manipulation later.
-        current_column = 0
-        for index, char in enumerate(line, start=1):
-            if char == "[":
-                self.state = State.IN_BRACKETS
-            elif char == "]":
-                self.state = State.OUTSIDE_BRACKETS
-            elif self.state == State.IN_BRACKETS and char.isalpha():
-                supply_crates.append(
-                    SupplyCrate(letter=char, column=current_column)
-                )
-            elif self.state == State.OUTSIDE_BRACKETS and char.isdigit():
-                break
-            elif (
-                self.state == State.OUTSIDE_BRACKETS
-                and char == " "
-                # Each column is 4 characters wide '[A] '.
-                and index % 4 == 0
-            ):
-                current_column += 1
+    """Parse the drawing of the stacks, one line at a time.
 
-        return supply_crates
+    Each column of the drawing is 4 characters wide, '[A] ', so the crate
+    letters are read directly at offsets 1, 5, 9... The rows read so far
+    are kept on the instance, parsers do not share any state.
+    """
 
+    def __init__(self) -> None:
+        self._rows: List[str] = []
 
-def parse_instruction(line: str) -> List[Instruction]:
-    instructions = []
-    for match in re.finditer(r"move (\d+) from (\d+) to (\d+)", line):
-        instructions.append(
-            Instruction(
-                quantity_to_move=int(match.group(1)),
-                origin_column=int(match.group(2)) - 1,
-                destination_column=int(match.group(3)) - 1,
+    def parse_supply_stacks(self, line: str) -> None:
+        # Crate letters, or spaces where a column has no crate.
+        self._rows.append(line.rstrip("\r\n")[1::4])
+
+    def build_stacks(self) -> List[List[str]]:
+        """Build the stacks from the rows parsed so far.
+
+        Returns:
+            List[List[str]]: Stacks of crates, from bottom to top.
+        """
+        # Rows are read from the bottom of the drawing, transposing them
+        # gives every column from bottom to top.
+        columns = zip_longest(*reversed(self._rows), fillvalue=" ")
+        return [list("".join(column).replace(" ", "")) for column in columns]
+
+
+class CrateMover:
+    """Apply instructions to stacks of crates, in place.
+
+    Stacks are lists from bottom to top. A move only touches the moved
+    crates: they are deleted from the end of the origin stack and
+    appended to the destination stack, so it costs O(quantity) whatever
+    the height of the stacks.
+    """
+
+    def __init__(
+        self,
+        stacks: List[List[str]],
+        model: MoverModel = MoverModel.CRATE_MOVER_9001,
+        cursor: int = 0,
+    ) -> None:
+        self.stacks = stacks
+        self.model = MoverModel(model)
+        # Number of instructions applied so far.
+        self.cursor = cursor
+
+    def move(self, instruction: Instruction) -> None:
+        """Move crates from one stack to another.
+
+        Args:
+            instruction (Instruction): Move to apply.
+
+        Raises:
+            ValueError: If the origin stack has fewer crates than asked.
+        """
+        quantity = instruction.quantity_to_move
+        origin = self.stacks[instruction.origin_column]
+        if quantity > len(origin):
+            raise ValueError(
+                f"Cannot move {quantity} crates from column "
+                f"{instruction.origin_column + 1}, it only has {len(origin)}"
+            )
+        self.cursor += 1
+        if quantity <= 0:
+            return
+        if self.model is MoverModel.CRATE_MOVER_9000:
+            crates_to_move = origin[: -quantity - 1 : -1]
+        else:
+            crates_to_move = origin[-quantity:]
+        del origin[-quantity:]
+        self.stacks[instruction.destination_column].extend(crates_to_move)
+
+    def run(self, instructions: Iterable[Instruction]) -> None:
+        """Apply instructions in order.
+
+        Args:
+            instructions (Iterable[Instruction]): Moves to apply.
+        """
+        for instruction in instructions:
+            self.move(instruction)
+
+    def top_crates(self) -> str:
+        """Get the crate at the top of each stack.
+
+        Returns:
+            str: Top crates from the first to the last stack, empty stacks
+            are skipped.
+        """
+        return "".join(stack[-1] for stack in self.stacks if stack)
+
+    def save_checkpoint(self, path: str) -> None:
+        """Save the stacks and the cursor in a compact binary file.
+
+        The file is written next to path then renamed, so an interrupted
+        save never leaves a corrupted checkpoint behind.
+
+        Args:
+            path (str): Path of the checkpoint file.
+        """
+        chunks = [
+            CHECKPOINT_HEADER.pack(
+                CHECKPOINT_MAGIC,
+                self.model.value,
+                self.cursor,
+                len(self.stacks),
             )
+        ]
+        for stack in self.stacks:
+            chunks.append(CHECKPOINT_STACK_SIZE.pack(len(stack)))
+            chunks.append("".join(stack).encode("ascii"))
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "wb") as f:
+            f.write(b"".join(chunks))
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load_checkpoint(cls, path: str) -> "CrateMover":
+        """Load a checkpoint saved by save_checkpoint.
+
+        Args:
+            path (str): Path of the checkpoint file.
+
+        Returns:
+            CrateMover: Mover with the saved stacks, model and cursor.
+        """
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, model, cursor, number_of_stacks = (
+            CHECKPOINT_HEADER.unpack_from(data)
         )
-    return instructions
+        if magic != CHECKPOINT_MAGIC:
+            raise ValueError(f"{path} is not a crate checkpoint")
+        offset = CHECKPOINT_HEADER.size
+        stacks = []
+        for _ in range(number_of_stacks):
+            (size,) = CHECKPOINT_STACK_SIZE.unpack_from(data, offset)
+            offset += CHECKPOINT_STACK_SIZE.size
+            stacks.append(list(data[offset : offset + size].decode("ascii")))
+            offset += size
+        return cls(stacks, MoverModel(model), cursor)
+
+
+def list_checkpoints(checkpoint_dir: str) -> Dict[int, str]:
+    """Find the checkpoints saved in a directory.
+
+    Args:
+        checkpoint_dir (str): Directory holding checkpoint files.
+
+    Returns:
+        Dict[int, str]: Path of each checkpoint, by cursor.
+    """
+    if not os.path.isdir(checkpoint_dir):
+        return {}
+    return {
+        int(name[: -len(CHECKPOINT_SUFFIX)]): os.path.join(
+            checkpoint_dir, name
+        )
+        for name in os.listdir(checkpoint_dir)
+        if name.endswith(CHECKPOINT_SUFFIX)
+    }
+
+
+def _start_replay(
+    stacks: List[List[str]],
+    checkpoints: Dict[int, str],
+    model: MoverModel,
+) -> CrateMover:
+    """Load the latest of checkpoints, or start from a copy of stacks."""
+    model = MoverModel(model)
+    if not checkpoints:
+        return CrateMover([stack[:] for stack in stacks], model)
+    crate_mover = CrateMover.load_checkpoint(checkpoints[max(checkpoints)])
+    if crate_mover.model is not model:
+        raise ValueError(
+            f"Checkpoints were saved by the {crate_mover.model.name}, "
+            f"not by the {model.name}"
+        )
+    return crate_mover
+
+
+def replay_with_checkpoints(
+    stacks: List[List[str]],
+    instructions: Iterable[Instruction],
+    checkpoint_dir: str,
+    checkpoint_every: int = 100_000,
+    model: MoverModel = MoverModel.CRATE_MOVER_9001,
+) -> CrateMover:
+    """Replay instructions, saving a checkpoint every checkpoint_every moves.
+
+    If checkpoint_dir already holds checkpoints, for instance after a
+    crash, the replay resumes from the latest one instead of starting
+    from stacks.
+
+    Args:
+        stacks (List[List[str]]): Initial stacks, from bottom to top.
+        instructions (Iterable[Instruction]): Every instruction, from the
+            first one, even when resuming.
+        checkpoint_dir (str): Directory where checkpoints are saved.
+        checkpoint_every (int): Number of instructions between checkpoints.
+        model (MoverModel): Crane used for the moves.
+
+    Returns:
+        CrateMover: Mover after the last instruction.
+    """
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    crate_mover = _start_replay(
+        stacks, list_checkpoints(checkpoint_dir), model
+    )
+
+    for instruction in islice(instructions, crate_mover.cursor, None):
+        crate_mover.move(instruction)
+        if crate_mover.cursor % checkpoint_every == 0:
+            crate_mover.save_checkpoint(
+                os.path.join(
+                    checkpoint_dir,
+                    f"{crate_mover.cursor:012d}{CHECKPOINT_SUFFIX}",
+                )
+            )
+    return crate_mover
+
+
+def top_crates_at(
+    index: int,
+    stacks: List[List[str]],
+    instructions: Sequence[Instruction],
+    checkpoint_dir: Optional[str] = None,
+    model: MoverModel = MoverModel.CRATE_MOVER_9001,
+) -> str:
+    """Get the top crates after the first index instructions.
+
+    The replay starts from the nearest checkpoint saved before index, or
+    from stacks if there is none.
+
+    Args:
+        index (int): Number of instructions to apply.
+        stacks (List[List[str]]): Initial stacks, from bottom to top.
+        instructions (Sequence[Instruction]): Every instruction.
+        checkpoint_dir (Optional[str]): Directory filled by
+            replay_with_checkpoints.
+        model (MoverModel): Crane used for the moves.
+
+    Returns:
+        str: Top crates at that point of the replay.
+    """
+    checkpoints = {
+        cursor: path
+        for cursor, path in list_checkpoints(checkpoint_dir or "").items()
+        if cursor <= index
+    }
+    crate_mover = _start_replay(stacks, checkpoints, model)
+    crate_mover.run(
+        instructions[cursor] for cursor in range(crate_mover.cursor, index)
+    )
+    return crate_mover.top_crates()
+
+
+def trace_top_crates(
+    stacks: List[List[str]],
+    instructions: Sequence[Instruction],
+    model: MoverModel = MoverModel.CRATE_MOVER_9001,
+) -> str:
+    """Find the final top crates without moving any crate.
+
+    Only the heights of the stacks are simulated forward. Then the final
+    top slot of each stack is traced backwards through the instructions
+    to the slot it came from in the initial stacks. This costs
+    O(number_of_stacks * len(instructions)), whatever the number of
+    crates moved.
+
+    Args:
+        stacks (List[List[str]]): Initial stacks, from bottom to top. They
+            are not modified.
+        instructions (Sequence[Instruction]): Moves to apply.
+        model (MoverModel): Crane used for the moves.
+
+    Returns:
+        str: Same as CrateMover.top_crates() after running instructions.
+
+    Raises:
+        ValueError: If a move takes more crates than its origin stack has.
+    """
+    model = MoverModel(model)
+    heights = [len(stack) for stack in stacks]
+    for instruction in instructions:
+        quantity, origin, destination = instruction
+        if quantity > heights[origin]:
+            raise ValueError(
+                f"Cannot move {quantity} crates from column {origin + 1}, "
+                f"it only has {heights[origin]}"
+            )
+        if quantity > 0:
+            heights[origin] -= quantity
+            heights[destination] += quantity
+
+    # [column, index from the bottom] of each final top crate.
+    slots = [
+        [column, height - 1]
+        for column, height in enumerate(heights)
+        if height
+    ]
+    for quantity, origin, destination in reversed(instructions):
+        if quantity <= 0:
+            continue
+        # Heights are the ones after this instruction, the moved crates
+        # are the top quantity crates of the destination stack.
+        moved_from = heights[destination] - quantity
+        heights[destination] -= quantity
+        heights[origin] += quantity
+        # Heights are now the ones before the instruction.
+        origin_from = heights[origin] - quantity
+        for slot in slots:
+            column, index = slot
+            if column == destination and index >= moved_from:
+                offset = index - moved_from
+                if model is MoverModel.CRATE_MOVER_9000:
+                    offset = quantity - 1 - offset
+                slot[0] = origin
+                slot[1] = origin_from + offset
+
+    return "".join(stacks[column][index] for column, index in slots)
+
+
+def _to_instruction(match: "re.Match[str]") -> Instruction:
+    quantity, origin, destination = match.groups()
+    return Instruction(
+        quantity_to_move=int(quantity),
+        origin_column=int(origin) - 1,
+        destination_column=int(destination) - 1,
+    )
+
+
+def parse_instruction(line: str) -> List[Instruction]:
+    return [
+        _to_instruction(match) for match in INSTRUCTION_PATTERN.finditer(line)
+    ]
+
+
+def iter_instructions(lines: Iterable[str]) -> Iterator[Instruction]:
+    """Decode instructions one line at a time.
+
+    Args:
+        lines (Iterable[str]): Lines, such as an open file. Lines that are
+            not instructions are skipped.
+
+    Yields:
+        Instruction: Decoded instructions, in order.
+    """
+    for line in lines:
+        match = INSTRUCTION_PATTERN.match(line)
+        if match:
+            yield _to_instruction(match)
+
+
+def decode_instructions(buffer: str) -> Iterator[Instruction]:
+    """Decode every instruction of a buffer in a single regex pass.
+
+    Args:
+        buffer (str): Text holding instructions, such as a whole file.
+
+    Yields:
+        Instruction: Decoded instructions, in order.
+    """
+    return map(_to_instruction, INSTRUCTION_PATTERN.finditer(buffer))
+
+
+def pack_instructions(instructions: Iterable[Instruction]) -> array:
+    """Pack instructions as unsigned ints, 3 per instruction.
+
+    Args:
+        instructions (Iterable[Instruction]): Instructions to pack.
+
+    Returns:
+        array: Packed instructions, array.tofile() stores them as is.
+    """
+    packed = array("I")
+    for instruction in instructions:
+        packed.extend(instruction)
+    return packed
+
+
+def unpack_instructions(packed: Sequence[int]) -> Iterator[Instruction]:
+    """Unpack instructions packed by pack_instructions.
+
+    Args:
+        packed (Sequence[int]): Packed instructions.
+
+    Yields:
+        Instruction: Unpacked instructions, in order.
+    """
+    values = iter(packed)
+    return map(Instruction, values, values, values)
+
+
+def read_packed_instructions(
+    f: BinaryIO, chunk_size: int = 1 << 16
+) -> Iterator[Instruction]:
+    """Replay instructions stored with array.tofile(), chunk by chunk.
+
+    Args:
+        f (BinaryIO): File opened in binary mode.
+        chunk_size (int): Number of instructions read at once.
+
+    Yields:
+        Instruction: Stored instructions, in order.
+    """
+    while True:
+        packed = array("I")
+        try:
+            packed.fromfile(f, 3 * chunk_size)
+        except EOFError:
+            # fromfile still keeps the values read before the end.
+            if len(packed) % 3:
+                raise ValueError("Truncated packed instruction log")
+            yield from unpack_instructions(packed)
+            return
+        yield from unpack_instructions(packed)
 
 
 if __name__ == "__main__":
-    supply_stack_parser = SupplyStackParser()
-    all_crates: List[SupplyCrate] = []
-    all_instructions: List[Instruction] = []
-    for line in data:
-        if line.startswith("move"):
-            all_instructions.extend(parse_instruction(line))
-        elif line.startswith("["):
-            all_crates.extend(supply_stack_parser.parse_supply_stacks(line))
-
-    # We add +1 because we saved the column number starting at 0.
-    number_of_stacks = max(crate.column for crate in all_crates) + 1
-    all_stacks = [[] for _ in range(number_of_stacks)]
-    # Because we created crates from top to bottom and I feel
-    # more comfortable with the stacks from bottom to top, we
-    # reverse the list.
-    for crate in reversed(all_crates):
-        all_stacks[crate.column].append(crate.letter)
-
-    # # Part 1
-    # for instruction in all_instructions:
-    #     # Crates are moved one by one.
-    #     crates_to_move = [
-    #         all_stacks[instruction.origin_column].pop()
-    #         for _ in range(instruction.quantity_to_move)
-    #     ]
-    #     for crate in crates_to_move:
-    #         all_stacks[instruction.destination_column].append(crate)
-
-    # print("".join(stack.pop() for stack in all_stacks))
-
-    # Part 2
-    for instruction in all_instructions:
-        # Crates are moved in a single operation.
-        crates_to_move = all_stacks[instruction.origin_column][
-            -instruction.quantity_to_move :
+    with open("aoc_05_input.txt") as f:
+        supply_stack_parser = SupplyStackParser()
+        # The drawing ends with a blank line, instructions follow.
+        for line in f:
+            if not line.strip():
+                break
+            # Rows of the drawing may start with spaces when the first
+            # stacks are shorter than the others.
+            if "[" in line:
+                supply_stack_parser.parse_supply_stacks(line)
+
+        all_stacks = supply_stack_parser.build_stacks()
+
+        # Part 1 uses the CrateMover 9000, part 2 the CrateMover 9001.
+        # Each part works on its own copy of the stacks, instructions are
+        # streamed into both without being stored.
+        crate_movers = [
+            CrateMover([stack[:] for stack in all_stacks], model)
+            for model in MoverModel
         ]
-        # We remove the crates from the origin stack.
-        all_stacks[instruction.origin_column] = all_stacks[
-            instruction.origin_column
-        ][: -instruction.quantity_to_move]
-        # We add the crates to the destination stack.
-        all_stacks[instruction.destination_column].extend(crates_to_move)
-
-    print("".join(stack.pop() for stack in all_stacks))
+        for instruction in iter_instructions(f):
+            for crate_mover in crate_movers:
+                crate_mover.move(instruction)
+
+    for part, crate_mover in enumerate(crate_movers, start=1):
+        print(f"Part {part}:", crate_mover.top_crates())
@@ -1,19 +1,255 @@
-with open("aoc_06_input.txt") as f:
-    data = f.read()
+import asyncio
+import mmap
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, List, Optional, Union
 
 
-def find_marker(data, marker_size):
-    accumulator = ""
-    for index, char in enumerate(data):
-        if len(accumulator) == marker_size:
-            print(accumulator, "at index", index)
-            break
-        if char not in accumulator and len(accumulator) < marker_size:
-            accumulator += char
-        elif char in accumulator:
-            accumulator = accumulator[accumulator.index(char)+1:] + char
+def _check_marker_size(marker_size: int) -> None:
+    if not 1 <= marker_size <= 256:
+        raise ValueError(
+            f"marker_size must be between 1 and 256, got {marker_size}"
+        )
+
+
+def find_marker(
+    data: Union[bytes, bytearray, memoryview, str], marker_size: int
+) -> Optional[int]:
+    """Find the end of the first marker of a datastream.
+
+    A marker is a window of marker_size bytes that are all different. The
+    window start and the last position of every byte value are tracked,
+    so each byte costs O(1) whatever the marker size.
+
+    Args:
+        data (Union[bytes, bytearray, memoryview, str]): Datastream.
+        marker_size (int): Number of different bytes in a marker, between
+            1 and 256.
+
+    Returns:
+        Optional[int]: Number of bytes read when the first marker is
+        complete, None if there is no marker.
+    """
+    _check_marker_size(marker_size)
+    if isinstance(data, str):
+        data = data.encode()
+    last_seen = [-1] * 256
+    window_start = 0
+    for index, byte in enumerate(data):
+        if last_seen[byte] >= window_start:
+            window_start = last_seen[byte] + 1
+        last_seen[byte] = index
+        if index - window_start + 1 == marker_size:
+            return index + 1
+    return None
+
+
+def _find_marker_in_segment(
+    path: str, start: int, end: int, marker_size: int
+) -> Optional[int]:
+    with open(path, "rb") as f, mmap.mmap(
+        f.fileno(), 0, access=mmap.ACCESS_READ
+    ) as buffer:
+        with memoryview(buffer)[start:end] as segment:
+            marker = find_marker(segment, marker_size)
+    return None if marker is None else start + marker
+
+
+def find_marker_parallel(
+    path: str,
+    marker_size: int,
+    workers: Optional[int] = None,
+    segments: Optional[int] = None,
+) -> Optional[int]:
+    """Find the first marker of a file using several processes.
+
+    The file is split into segments overlapping by marker_size - 1 bytes,
+    so every window of the file is entirely inside at least one segment.
+    Segments are searched in parallel and read back in order: the first
+    segment holding a marker gives the answer right away, the segments
+    that have not started yet are cancelled and the running ones are not
+    waited for.
+
+    Args:
+        path (str): Path of the datastream capture.
+        marker_size (int): Number of different bytes in a marker.
+        workers (Optional[int]): Number of processes, defaults to the
+            number of CPUs.
+        segments (Optional[int]): Number of segments, defaults to 4 per
+            worker so that an early marker cancels most of the work.
+
+    Returns:
+        Optional[int]: Same as find_marker on the whole file.
+    """
+    _check_marker_size(marker_size)
+    workers = workers or os.cpu_count() or 1
+    segments = segments or 4 * workers
+    file_size = os.path.getsize(path)
+    if file_size == 0:
+        return None
+    segment_size = -(-file_size // segments)
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        futures = [
+            executor.submit(
+                _find_marker_in_segment,
+                path,
+                start,
+                min(start + segment_size + marker_size - 1, file_size),
+                marker_size,
+            )
+            for start in range(0, file_size, segment_size)
+        ]
+        for future in futures:
+            marker = future.result()
+            if marker is not None:
+                return marker
+        return None
+    finally:
+        # Leaving a with block would wait for the segments still being
+        # searched. Pending segments are cancelled and running ones are
+        # left to finish in the background.
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def benchmark(
+    path: str, marker_size: int = 14, capture_size: int = 1 << 24
+) -> None:
+    """Print how long the serial and parallel searches take on a file.
+
+    The parallel search is also timed on two generated captures of
+    capture_size bytes, one without any marker and one whose only marker
+    is at the very start, to measure what stopping early saves.
+
+    Args:
+        path (str): Path of the datastream capture.
+        marker_size (int): Number of different bytes in a marker.
+        capture_size (int): Size of the generated captures.
+    """
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        expected = find_marker(f.read(), marker_size)
+    serial_time = time.perf_counter() - start
+    print(f"serial    : {serial_time:.3f}s")
+
+    for workers in (2, 4, 8):
+        start = time.perf_counter()
+        marker = find_marker_parallel(path, marker_size, workers=workers)
+        elapsed = time.perf_counter() - start
+        assert marker == expected, (marker, expected)
+        print(
+            f"{workers:>2} workers: {elapsed:.3f}s "
+            f"(x{serial_time / elapsed:.2f})"
+        )
+
+    # Two distinct bytes repeated never hold a marker of 3 bytes or more.
+    filler = b"\x00\x01" * (capture_size // 2)
+    with tempfile.TemporaryDirectory() as directory:
+        no_marker_path = os.path.join(directory, "no_marker")
+        with open(no_marker_path, "wb") as f:
+            f.write(filler)
+        early_marker_path = os.path.join(directory, "early_marker")
+        with open(early_marker_path, "wb") as f:
+            f.write(bytes(range(marker_size)) + filler)
+
+        for workers in (2, 4, 8):
+            start = time.perf_counter()
+            marker = find_marker_parallel(
+                no_marker_path, marker_size, workers=workers
+            )
+            no_marker_time = time.perf_counter() - start
+            assert marker is None, marker
+
+            start = time.perf_counter()
+            marker = find_marker_parallel(
+                early_marker_path, marker_size, workers=workers
+            )
+            early_time = time.perf_counter() - start
+            assert marker == marker_size, marker
+            print(
+                f"{workers:>2} workers, no marker: {no_marker_time:.3f}s, "
+                f"early marker: {early_time:.3f}s "
+                f"(x{no_marker_time / early_time:.2f})"
+            )
+
+
+class MarkerDetector:
+    """Find markers in a datastream fed chunk by chunk.
+
+    The window and the last-seen table are kept between calls to feed, so
+    a marker split across two chunks is found as soon as its last byte
+    arrives. Once a marker is found, the search starts over on the bytes
+    that follow it, so a never-ending stream can hold several markers.
+    """
+
+    def __init__(self, marker_size: int) -> None:
+        _check_marker_size(marker_size)
+        self.marker_size = marker_size
+        # Number of bytes fed so far.
+        self.position = 0
+        self._last_seen = [-1] * 256
+        self._window_start = 0
+
+    def feed(self, chunk: Union[bytes, bytearray, memoryview]) -> List[int]:
+        """Scan the next chunk of the datastream.
+
+        Args:
+            chunk (Union[bytes, bytearray, memoryview]): Bytes following
+                the ones already fed.
+
+        Returns:
+            List[int]: Number of bytes read from the start of the stream
+            when each marker completed within this chunk.
+        """
+        markers = []
+        last_seen = self._last_seen
+        window_start = self._window_start
+        marker_size = self.marker_size
+        for index, byte in enumerate(chunk, start=self.position):
+            if last_seen[byte] >= window_start:
+                window_start = last_seen[byte] + 1
+            last_seen[byte] = index
+            if index - window_start + 1 == marker_size:
+                markers.append(index + 1)
+                window_start = index + 1
+        self.position += len(chunk)
+        self._window_start = window_start
+        return markers
+
+
+async def watch_markers(
+    reader: asyncio.StreamReader, marker_size: int, chunk_size: int = 4096
+) -> AsyncIterator[int]:
+    """Yield the markers of a stream as soon as they arrive.
+
+    Args:
+        reader (asyncio.StreamReader): Stream to read, such as a socket.
+        marker_size (int): Number of different bytes in a marker.
+        chunk_size (int): Maximum number of bytes read at once.
+
+    Yields:
+        int: Number of bytes read from the start of the stream when each
+        marker completed.
+    """
+    detector = MarkerDetector(marker_size)
+    while True:
+        chunk = await reader.read(chunk_size)
+        if not chunk:
+            return
+        for marker in detector.feed(chunk):
+            yield marker
 
 
 if __name__ == "__main__":
-    find_marker(data, 4)
-    find_marker(data, 14)
+    if "--benchmark" in sys.argv:
+        benchmark("aoc_06_input.txt")
+        sys.exit()
+
+    with open("aoc_06_input.txt", "rb") as f:
+        data = f.read()
+
+    print("Start of packet marker at index", find_marker(data, 4))
+    print("Start of message marker at index", find_marker(data, 14))
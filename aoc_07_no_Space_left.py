@@ -1,35 +1,50 @@
-import re
-from typing import Dict, List, Set, Union
+import sys
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
 
-with open("aoc_07_input.txt") as f:
-    data = f.read().splitlines()
+FILESYSTEM_SIZE = 70_000_000
+TARGETED_AVAILABLE_SPACE = 30_000_000
 
 
 class Directory:
-    # "/absolute/path/to/dir" : Directory
-    _dir_dict: Dict[str, "Directory"] = {}
+    __slots__ = (
+        "name",
+        "parent_dir",
+        "_absolute_path",
+        "_sub_dirs",
+        "_files",
+        "_files_size",
+        "_size",
+    )
 
     def __init__(
         self, name: str, parent_dir: Union["Directory", None] = None
     ) -> None:
         self.name = name
         self.parent_dir = parent_dir
-        self._sub_dirs: Set["Directory"] = set()
+        # The path never changes, it is built once from the parent's.
+        if not parent_dir:
+            self._absolute_path = "/"
+        elif parent_dir.absolute_path == "/":
+            self._absolute_path = f"/{name}"
+        else:
+            self._absolute_path = f"{parent_dir.absolute_path}/{name}"
+        # Sub directory name : Directory
+        self._sub_dirs: Dict[str, "Directory"] = {}
         self._files: Set["File"] = set()
-        Directory._dir_dict[self.absolute_path] = self
+        # Total size of the files directly in this directory.
+        self._files_size = 0
+        # Cached total size of the subtree, None when it must be computed
+        # again. If a directory has no cached size, its parents neither.
+        self._size: Union[int, None] = None
 
     @property
     def absolute_path(self) -> str:
-        if not self.parent_dir:
-            return "/"
-        if self.parent_dir and self.parent_dir.absolute_path == "/":
-            return f"/{self.name}"
-        else:
-            return f"{self.parent_dir.absolute_path}/{self.name}"
+        return self._absolute_path
 
     @property
     def sub_dirs(self) -> List["Directory"]:
-        return self._sub_dirs
+        return list(self._sub_dirs.values())
 
     @property
     def files(self) -> List["File"]:
@@ -37,18 +52,47 @@ class Directory:
 
     @property
     def size(self) -> int:
-        size = 0
-        for file in self.files:
-            size += file.size
-        for sub_dir in self.sub_dirs:
-            size += sub_dir.size
-        return size
+        if self._size is None:
+            self._compute_sizes()
+        return self._size
+
+    def _compute_sizes(self) -> None:
+        # Iterative post-order walk, only through the directories whose
+        # size is not cached, so each directory is summed once.
+        stack = [(self, False)]
+        while stack:
+            dir_, sub_dirs_done = stack.pop()
+            if sub_dirs_done:
+                dir_._size = dir_._files_size + sum(
+                    sub_dir._size for sub_dir in dir_._sub_dirs.values()
+                )
+            elif dir_._size is None:
+                stack.append((dir_, True))
+                stack.extend(
+                    (sub_dir, False)
+                    for sub_dir in dir_._sub_dirs.values()
+                    if sub_dir._size is None
+                )
+
+    def _invalidate_size(self) -> None:
+        dir_ = self
+        while dir_ is not None and dir_._size is not None:
+            dir_._size = None
+            dir_ = dir_.parent_dir
+
+    def get_sub_dir(self, name: str) -> Union["Directory", None]:
+        return self._sub_dirs.get(name)
 
     def add_sub_dir(self, sub_dir: "Directory") -> None:
-        self._sub_dirs.add(sub_dir)
+        if self._sub_dirs.get(sub_dir.name) is not sub_dir:
+            self._sub_dirs[sub_dir.name] = sub_dir
+            self._invalidate_size()
 
     def add_file(self, file: "File") -> None:
-        self._files.add(file)
+        if file not in self._files:
+            self._files.add(file)
+            self._files_size += file.size
+            self._invalidate_size()
 
     @sub_dirs.getter
     def get_sub_dirs(self) -> List["Directory"]:
@@ -75,12 +119,17 @@ class Directory:
 
 
 class File:
+    __slots__ = ("name", "size", "parent_dir")
+
     def __init__(self, name: str, size: int, parent_dir: "Directory") -> None:
         self.name = name
-        self.extention = name.split(".")[-1]
         self.size = size
         self.parent_dir = parent_dir
 
+    @property
+    def extention(self) -> str:
+        return self.name.split(".")[-1]
+
     @property
     def absolute_path(self) -> str:
         if (
@@ -90,28 +139,199 @@ class File:
         return f"{self.parent_dir.absolute_path}/{self.name}"
 
 
-class State:
-    current_dir = None
-    root_dir = Directory(name="/")
+class FileSystem:
+    """A filesystem rebuilt from a terminal log.
+
+    Everything belongs to the instance: several filesystems can be built
+    at the same time, in different threads, and nothing is left behind
+    once one is dropped.
+    """
 
-    @classmethod
-    def pwd(cls) -> Directory:
-        return cls.current_dir or cls.root_dir
+    def __init__(self) -> None:
+        self.root_dir = Directory(name="/")
+        self.current_dir = self.root_dir
+        # "/absolute/path/to/dir" : Directory
+        self.dirs: Dict[str, Directory] = {"/": self.root_dir}
 
-    @classmethod
-    def set_current_dir(cls, new_dir: Directory) -> None:
-        cls.current_dir = new_dir
+    def pwd(self) -> Directory:
+        return self.current_dir
+
+    def set_current_dir(self, new_dir: Union[Directory, None]) -> None:
+        # Going up from the root stays at the root.
+        self.current_dir = new_dir or self.root_dir
+
+    def change_dir(self, name: str) -> None:
+        """Move to the root, the parent or a sub directory, like cd.
+
+        Args:
+            name (str): "/", ".." or the name of a sub directory.
+        """
+        if name == "/":
+            self.set_current_dir(self.root_dir)
+        elif name == "..":
+            self.set_current_dir(self.current_dir.parent_dir)
+        else:
+            sub_dir = self.current_dir.get_sub_dir(name)
+            if sub_dir:
+                self.set_current_dir(sub_dir)
+
+    def make_dir(self, name: str) -> Directory:
+        """Get a sub directory of the current directory, create it if needed.
+
+        Args:
+            name (str): Name of the sub directory.
+
+        Returns:
+            Directory: The sub directory.
+        """
+        dir_ = self.current_dir.get_sub_dir(name)
+        if dir_ is None:
+            dir_ = Directory(name=name, parent_dir=self.current_dir)
+            self.current_dir.add_sub_dir(dir_)
+            self.dirs[dir_.absolute_path] = dir_
+        return dir_
+
+    def make_file(self, name: str, size: int) -> File:
+        """Add a file to the current directory.
+
+        Args:
+            name (str): Name of the file.
+            size (int): Size of the file.
+
+        Returns:
+            File: The new file.
+        """
+        file = File(name=name, size=size, parent_dir=self.current_dir)
+        self.current_dir.add_file(file)
+        return file
+
+    @property
+    def directories(self) -> Iterable[Directory]:
+        return self.dirs.values()
+
+    def get_dir_size(self, path: str) -> int:
+        return getattr(self.dirs.get(path), "size", 0)
+
+    def dir_sizes(self) -> List[int]:
+        return [dir_.size for dir_ in self.directories]
+
+
+class ColumnarFileSystem:
+    """A filesystem stored as columns, for very large terminal logs.
+
+    Each entry, directory or file, is a row index shared by the columns:
+    parent row, own size (0 for directories), kind, and offset of its
+    name in a single bytes blob. Rows are only ever appended, a parent is
+    always created before its children, so parents[row] < row.
+    """
+
+    DIR = 0
+    FILE = 1
+
+    def __init__(self) -> None:
+        self.parents = array("q", [-1])
+        self.sizes = array("Q", [0])
+        self.kinds = array("b", [self.DIR])
+        self.name_offsets = array("Q", [0])
+        self.names = bytearray(b"/")
+        self.current_dir = 0
+        # (parent row, name) : row, only for directories, to resolve cd.
+        self._sub_dirs: Dict[Tuple[int, str], int] = {}
+        # Output of subtree_sizes, None until computed or after a row is
+        # added.
+        self._totals: Optional[array] = None
+
+    def __len__(self) -> int:
+        return len(self.parents)
+
+    def _add(self, kind: int, name: str, size: int) -> int:
+        self._totals = None
+        self.parents.append(self.current_dir)
+        self.sizes.append(size)
+        self.kinds.append(kind)
+        self.name_offsets.append(len(self.names))
+        self.names += name.encode()
+        return len(self.parents) - 1
+
+    def name(self, row: int) -> str:
+        start = self.name_offsets[row]
+        end = (
+            self.name_offsets[row + 1]
+            if row + 1 < len(self.name_offsets)
+            else len(self.names)
+        )
+        return self.names[start:end].decode()
+
+    def change_dir(self, name: str) -> None:
+        if name == "/":
+            self.current_dir = 0
+        elif name == "..":
+            self.current_dir = max(self.parents[self.current_dir], 0)
+        else:
+            self.current_dir = self._sub_dirs.get(
+                (self.current_dir, name), self.current_dir
+            )
+
+    def make_dir(self, name: str) -> int:
+        key = (self.current_dir, name)
+        if key not in self._sub_dirs:
+            self._sub_dirs[key] = self._add(self.DIR, name, 0)
+        return self._sub_dirs[key]
+
+    def make_file(self, name: str, size: int) -> int:
+        return self._add(self.FILE, name, size)
+
+    def subtree_sizes(self) -> array:
+        """Compute the total size of every row in one reverse sweep.
+
+        The result is cached until the next row is added, so it must not
+        be modified.
+
+        Returns:
+            array: Total size of each row, a file's total is its size.
+        """
+        if self._totals is not None:
+            return self._totals
+        totals = array("Q", self.sizes)
+        parents = self.parents
+        # Children always come after their parent, walking the rows
+        # backwards folds every subtree before its parent is folded.
+        for row in range(len(totals) - 1, 0, -1):
+            totals[parents[row]] += totals[row]
+        self._totals = totals
+        return totals
+
+    def dir_sizes(self) -> List[int]:
+        totals = self.subtree_sizes()
+        kinds = self.kinds
+        return [
+            total for total, kind in zip(totals, kinds) if kind == self.DIR
+        ]
+
+    def get_dir_size(self, path: str) -> int:
+        row = 0
+        for name in path.strip("/").split("/"):
+            if not name:
+                continue
+            if (row, name) not in self._sub_dirs:
+                return 0
+            row = self._sub_dirs[(row, name)]
+        return self.subtree_sizes()[row]
 
 
 class Parser:
-    state = State()
+    def __init__(
+        self,
+        file_system: Union[FileSystem, ColumnarFileSystem, None] = None,
+    ) -> None:
+        self.file_system = file_system or FileSystem()
 
     def read_line(self, line: str) -> None:
         if line.startswith("$"):
             self.handle_commands(line)
         elif line.startswith("dir"):
             return self.handle_dir(line)
-        elif re.match(r"^\d+", line):
+        elif line[:1].isdigit():
             return self.handle_file(line)
 
     def handle_commands(self, line: str) -> None:
@@ -121,57 +341,150 @@ class Parser:
 
     def handle_cd(self, line: str) -> None:
         dir_name = line.split()[-1]
-        if dir_name == "..":
-            self.state.set_current_dir(self.state.pwd().parent_dir)
-        else:
-            for sub_dir in self.state.pwd().sub_dirs:
-                if sub_dir.name == dir_name:
-                    self.state.set_current_dir(sub_dir)
-                    break
+        self.file_system.change_dir(dir_name)
 
     def handle_dir(self, line: str) -> None:
         dir_name = line.split()[-1]
-        dir_ = Directory(name=dir_name, parent_dir=self.state.pwd())
-        self.state.pwd().add_sub_dir(dir_)
+        self.file_system.make_dir(dir_name)
 
     def handle_file(self, line: str) -> None:
         size, file_name = line.split()
-        file = File(
-            name=file_name, size=int(size), parent_dir=self.state.pwd()
-        )
-        self.state.pwd().add_file(file)
+        self.file_system.make_file(name=file_name, size=int(size))
 
 
-def get_dir_size(path: str) -> int:
-    return getattr(Directory._dir_dict.get(path), "size", 0)
+def _leave_dir(totals: List[int]) -> int:
+    # The directory is final once left, its size goes to its parent.
+    size = totals.pop()
+    totals[-1] += size
+    return size
 
 
-if __name__ == "__main__":
-    parser = Parser()
+def iter_dir_sizes(lines: Iterable[str]) -> Iterator[int]:
+    """Replay a terminal log and yield each directory size once it is final.
+
+    Only the running totals of the directories from the root to the
+    current directory are kept, so memory is bounded by the depth of the
+    tree. The log must list each directory once.
+
+    Args:
+        lines (Iterable[str]): Lines of the terminal log.
 
-    for line in data:
-        parser.read_line(line)
+    Yields:
+        int: Total size of each directory, when it is left for good. The
+        root comes last.
+    """
+    # totals[0] is the root, totals[-1] the current directory.
+    totals = [0]
+    for line in lines:
+        if line.startswith("$ cd"):
+            dir_name = line.split()[-1]
+            if dir_name == "/":
+                while len(totals) > 1:
+                    yield _leave_dir(totals)
+            elif dir_name == "..":
+                if len(totals) > 1:
+                    yield _leave_dir(totals)
+            else:
+                totals.append(0)
+        elif line[:1].isdigit():
+            totals[-1] += int(line.split(maxsplit=1)[0])
+    while len(totals) > 1:
+        yield _leave_dir(totals)
+    yield totals[0]
+
+
+def summarize_stream(
+    lines: Iterable[str], max_size: int = 100000
+) -> Tuple[int, int, int]:
+    """Answer both parts in a single pass over a terminal log.
+
+    Part 2 needs the root size, only known at the end. Until then, the
+    size of everything seen so far is a lower bound of the root size, so
+    directories too small to ever free enough space are dropped as the
+    log is read. The pruning runs each time the candidates have doubled,
+    so it costs O(1) amortised per directory and memory is bounded by
+    the number of candidate sizes, not by the depth of the tree.
+
+    Args:
+        lines (Iterable[str]): Lines of the terminal log.
+        max_size (int): Directories smaller than this are summed (part 1).
+
+    Returns:
+        Tuple[int, int, int]: Part 1 sum, minimal size of the directory
+        to delete, and size of the smallest directory to delete (part 2).
+    """
+    reserved_space = FILESYSTEM_SIZE - TARGETED_AVAILABLE_SPACE
+    size_of_small_dirs = 0
+    candidates: List[int] = []
+    next_prune = 1024
+    largest_size = 0
+    for size in iter_dir_sizes(lines):
+        if size < max_size:
+            size_of_small_dirs += size
+        # A directory contains all the directories finished before it in
+        # its subtree, the largest size seen is the best lower bound.
+        largest_size = max(largest_size, size)
+        if size >= largest_size - reserved_space:
+            candidates.append(size)
+        if len(candidates) > next_prune:
+            candidates = [
+                candidate
+                for candidate in candidates
+                if candidate >= largest_size - reserved_space
+            ]
+            next_prune = max(1024, 2 * len(candidates))
+
+    # The root comes last, it is the largest size.
+    dir_to_delete_min_size = largest_size - reserved_space
+    smallest_dir_to_hit_target = min(
+        candidate
+        for candidate in candidates
+        if candidate >= dir_to_delete_min_size
+    )
+    return (
+        size_of_small_dirs,
+        dir_to_delete_min_size,
+        smallest_dir_to_hit_target,
+    )
+
+
+if __name__ == "__main__":
+    # --stream answers both parts without building the tree.
+    if "--stream" in sys.argv:
+        with open("aoc_07_input.txt") as f:
+            part_1, min_size, found = summarize_stream(f)
+        print("Part 1:", part_1)
+        print("Part 2:\nMinimal size of dir to delete:", min_size)
+        print("Found: ", found)
+        sys.exit()
+
+    # --columnar stores the tree as arrays, for very large logs.
+    if "--columnar" in sys.argv:
+        parser = Parser(ColumnarFileSystem())
+    else:
+        parser = Parser(FileSystem())
+
+    with open("aoc_07_input.txt") as f:
+        for line in f:
+            parser.read_line(line)
+
+    file_system = parser.file_system
+    dir_sizes = file_system.dir_sizes()
 
     # Part 1
     size_of_dirs_under_100000 = sum(
-        dir_.size
-        for dir_ in Directory._dir_dict.values()
-        if dir_.size < 100000
+        size for size in dir_sizes if size < 100000
     )
     print("Part 1:", size_of_dirs_under_100000)
 
     # Part 2
-    FILESYSTEM_SIZE = 70_000_000
-    TARGETED_AVAILABLE_SPACE = 30_000_000
-    CURRENT_AVAILABLE_SPACE = FILESYSTEM_SIZE - get_dir_size("/")
+    CURRENT_AVAILABLE_SPACE = FILESYSTEM_SIZE - file_system.get_dir_size("/")
     DIR_TO_DELETE_MIN_SIZE = TARGETED_AVAILABLE_SPACE - CURRENT_AVAILABLE_SPACE
 
     smallest_dir_to_hit_target = min(
-        dir_
-        for dir_ in Directory._dir_dict.values()
-        if dir_.size >= DIR_TO_DELETE_MIN_SIZE
+        size for size in dir_sizes if size >= DIR_TO_DELETE_MIN_SIZE
     )
     print("Part 2:\nMinimal size of dir to delete:", DIR_TO_DELETE_MIN_SIZE)
     print(
-        "Found: ", smallest_dir_to_hit_target.size
+        "Found: ", smallest_dir_to_hit_target
     )